@@ -2,22 +2,36 @@ import streamlit as st
 from PIL import Image
 import io
 import base64
+import orjson
 import os
+import re
 from dotenv import load_dotenv
 import google.generativeai as genai
-import hashlib
+import blake3
+import imagehash
+import numpy as np
 import pandas as pd
 from fpdf import FPDF
+from pathlib import Path
 import urllib.parse
 from amazon_paapi import AmazonApi
 import datetime
+import functools
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # Semantic recipe caching is optional
+    SentenceTransformer = None
 
 # Load environment variables
 load_dotenv()
 
-# Set up Google Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
 # Set up the model
 generation_config = {
     "temperature": 1,
@@ -25,197 +39,323 @@ generation_config = {
     "top_k": 64,
     "max_output_tokens": 8192,
 }
-model = genai.GenerativeModel(
-    model_name="gemini-1.5-pro",
-    generation_config=generation_config,
-)
+# The fixed instructions live in the system instruction so every request
+# shares the same prompt prefix and only sends its own variables.
+VISION_INSTRUCTION = "List all the food items you can see in the images you are given. Provide the list in a comma-separated format."
+RECIPE_INSTRUCTION = "Create a recipe using the ingredients you are given, following any dietary or cuisine preference. Provide the recipe name, ingredients with quantities, and step-by-step instructions."
+
+# Configure Gemini and build each model once per process, shared by all sessions
+@st.cache_resource
+def get_model(system_instruction):
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai.GenerativeModel(
+        model_name="gemini-1.5-pro",
+        generation_config=generation_config,
+        system_instruction=system_instruction,
+    )
 
 # Set page config
 st.set_page_config(page_title="smart-kitchen-assistant", layout="wide")
 
 # Custom CSS
-st.markdown("""
-    <style>
-    /* Light mode background */
-    .main .block-container {
-        padding: 2rem;
-        background-color: #EFF6FB;  /* Light background */
-        border-radius: 12px;
-    }
-
-    /* Dark mode background */
-    body[data-theme="dark"] .main .block-container {
-        background-color: #EAE7DC;  /* Dark background */
-    }
-
-    /* Headings */
-    h1, h2, h3 {
-        color: #A8D0E6;  /* Heading color for light mode */
-        font-family: 'Poppins', sans-serif;
-        font-weight: 600;
-    }
-
-    body[data-theme="dark"] h1, 
-    body[data-theme="dark"] h2, 
-    body[data-theme="dark"] h3 {
-        color: #8E8D8A;  /* Heading color for dark mode */
-    }
-
-    /* General text styling */
-    .main p, .main li {
-        color: #A8D0E6;  /* Text color for light mode */
-        font-family: 'Poppins', sans-serif;
-    }
-
-    body[data-theme="dark"] .main p, 
-    body[data-theme="dark"] .main li {
-        color: #8E8D8A;  /* Text color for dark mode */
-    }
-
-    /* Buttons in light mode */
-    .stButton>button {
-        border-radius: 30px;
-        font-weight: bold;
-        background-color: #A8D0E6;  /* Button background for light mode */
-        color: #24305E;  /* Button text color for light mode */
-        padding: 0.6rem 1.2rem;
-        font-size: 1rem;
-        border: none;
-        transition: all 0.3s ease;
-        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-    }
-
-    .stButton>button:hover {
-        background-color: #EFF6FB;  /* Hover color similar to white */
-        color: #24305E;  /* Hover text color */
-        box-shadow: 0 6px 12px rgba(0,0,0,0.1);
-        transform: translateY(-2px);
-    }
-
-    /* Buttons in dark mode */
-    body[data-theme="dark"] .stButton>button {
-        background-color: #E85A4F;  /* Button background for dark mode */
-        color: white;  /* Button text color for dark mode */
-    }
-
-    body[data-theme="dark"] .stButton>button:hover {
-        background-color: #E98074;  /* Hover color for dark mode */
-        color: white;  /* Hover text color */
-        box-shadow: 0 6px 12px rgba(0,0,0,0.1);
-        transform: translateY(-2px);
-    }
-
-    /* Recipe Container Styling for light mode */
-    .recipe-container {
-        background-color: #24305E;  /* Light mode background */
-        padding: 1.5rem;
-        border-radius: 12px;
-        box-shadow: 0 4px 8px rgba(0, 0, 0, 0.1);
-        margin-bottom: 1.5rem;
-        color: #A8D0E6;  /* Text color for light mode */
-    }
-
-    /* Recipe Container Styling for dark mode */
-    body[data-theme="dark"] .recipe-container {
-        background-color: #EAE7DC;  /* Dark mode background */
-        color: #8E8D8A;  /* Text color for dark mode */
-    }
-
-    </style>
-    """, unsafe_allow_html=True)
+@st.cache_resource
+def load_css():
+    # Minify once per process so every rerun sends a smaller style block
+    css = Path(__file__).with_name("styles.css").read_text(encoding="utf-8")
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{}:;,>])\s*", r"\1", css)
+    return f"<style>{css.strip()}</style>"
+
+st.markdown(load_css(), unsafe_allow_html=True)
 
 
 # Helper functions
-def image_to_bytes(image):
+# Uploaded images are kept as their original compressed bytes and only
+# decoded when they are actually needed.
+def _shrink_for_llm(image_bytes):
+    # Gemini downsamples images itself, so sending full-resolution photos only
+    # costs upload time; re-encoding also drops EXIF/ICC metadata.
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft("RGB", (1024, 1024))  # Lets JPEGs decode at reduced scale
+    image.thumbnail((1024, 1024), Image.LANCZOS)
     buffered = io.BytesIO()
-    image.save(buffered, format="JPEG")
+    image.convert("RGB").save(buffered, format="JPEG", quality=85, optimize=True)
     return buffered.getvalue()
 
-def image_hash(image):
-    return hashlib.md5(image_to_bytes(image)).hexdigest()
-
-def is_duplicate(new_image, existing_images):
-    new_hash = image_hash(new_image)
-    for img in existing_images:
-        if image_hash(img) == new_hash:
-            return True
-    return False
-
+def image_hash(image_bytes):
+    # A collision would silently drop a user's photo, so use a
+    # collision-resistant digest; BLAKE3 is still faster than MD5.
+    return blake3.blake3(image_bytes).hexdigest(length=16)
+
+def is_duplicate(new_hash):
+    return new_hash in st.session_state.image_hashes
+
+# Maximum Hamming distance between the perceptual hashes of two photos of the same shelf
+NEAR_DUPLICATE_DISTANCE = 5
+
+def perceptual_hash(image):
+    return int(str(imagehash.phash(image)), 16)
+
+def is_near_duplicate(new_phash):
+    if not st.session_state.phashes:
+        return False
+    differing_bits = np.array(st.session_state.phashes, dtype=np.uint64) ^ np.uint64(new_phash)
+    distances = np.unpackbits(differing_bits.view(np.uint8)).reshape(-1, 64).sum(axis=1)
+    return bool((distances <= NEAR_DUPLICATE_DISTANCE).any())
+
+# Images sent to Gemini in a single identification request
+IDENTIFY_BATCH_SIZE = 8
+
+# Gemini calls are cached on disk so reruns and app restarts with the same
+# inputs skip the API. Failures raise instead of returning a fallback so they
+# are never cached.
+# Batches are keyed on their images' upload digests; the underscore keeps
+# Streamlit from hashing the raw bytes, and a cache hit skips decoding them.
+@st.cache_data(persist="disk", max_entries=1000, show_spinner=False)
+def _identify_batch(image_keys, _images):
+    response = get_model(VISION_INSTRUCTION).generate_content([
+        {"mime_type": "image/jpeg", "data": base64.b64encode(_shrink_for_llm(image_bytes)).decode('utf-8')}
+        for image_bytes in _images
+    ])
+    return [item.strip() for item in response.text.split(',')]
+
+@functools.lru_cache(maxsize=1024)
+def _normalize_item(item):
+    # Dedupe key only: lowercase and singularize so "Tomatoes" and " tomato" count as one item
+    item = item.strip().lower()
+    if item.endswith("oes"):
+        return item[:-2]
+    if item.endswith("s") and not item.endswith(("ss", "us", "is")):
+        return item[:-1]
+    return item
+
+# `images` is a list of (digest, bytes) pairs, hashed once at upload time.
+# Returns the items found and whether every batch succeeded.
 def identify_items(images):
-    all_items = []
-    for image in images:
-        base64_image = base64.b64encode(image_to_bytes(image)).decode('utf-8')
+    # Send the images in as few requests as possible, running any extra batches concurrently
+    batches = [images[i:i + IDENTIFY_BATCH_SIZE] for i in range(0, len(images), IDENTIFY_BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [
+            executor.submit(_identify_batch, tuple(key for key, _ in batch), [image_bytes for _, image_bytes in batch])
+            for batch in batches
+        ]
 
+    all_items = []
+    failed = False
+    for future in futures:
         try:
-            response = model.generate_content([
-                "List all the food items you can see in this image. Provide the list in a comma-separated format.",
-                {"mime_type": "image/jpeg", "data": base64_image}
-            ])
-
-            items = response.text.split(',')
-            all_items.extend([item.strip() for item in items])
+            all_items.extend(future.result())
         except Exception as e:
             st.error(f"An error occurred while identifying items: {str(e)}")
+            failed = True
+
+    # Remove duplicates while keeping the order items were found in,
+    # and the name of each as first written
+    unique_items = {}
+    for item in all_items:
+        if item.strip():
+            unique_items.setdefault(_normalize_item(item), item.strip())
+    return list(unique_items.values()), not failed
+
+# Recipes are streamed as Gemini writes them, which st.cache_data can't memoize,
+# so finished recipes are cached in the SQLite store instead.
+# `variant` only distinguishes the cache entries of the recipes requested together
+def stream_recipe(items, diet_preference, cuisine_preference, variant=0):
+    key = orjson.dumps([items, diet_preference, cuisine_preference, variant]).decode()
+    recipe = load_cached_recipe(key)
+    if recipe is not None:
+        yield recipe
+        return
 
-    return list(set(all_items))  # Remove duplicates
+    diet_instruction = f"The recipe should be {diet_preference.lower()}." if diet_preference != "None" else ""
+    cuisine_instruction = f"The recipe should be {cuisine_preference} cuisine." if cuisine_preference != "Any" else ""
 
-def generate_recipe(items, diet_preference, cuisine_preference):
-    try:
-        diet_instruction = f"The recipe should be {diet_preference.lower()}." if diet_preference != "None" else ""
-        cuisine_instruction = f"The recipe should be {cuisine_preference} cuisine." if cuisine_preference != "Any" else ""
+    prompt = f"Ingredients: {', '.join(items)}. {diet_instruction} {cuisine_instruction}"
 
-        prompt = f"Create a recipe using these ingredients: {', '.join(items)}. {diet_instruction} {cuisine_instruction} Provide the recipe name, ingredients with quantities, and step-by-step instructions."
+    response = get_model(RECIPE_INSTRUCTION).generate_content(prompt, stream=True)
 
-        response = model.generate_content(prompt)
+    chunks = []
+    for chunk in response:
+        chunks.append(chunk.text)
+        yield chunk.text
+    save_cached_recipe(key, "".join(chunks))
 
-        return response.text
+# Worker threads pass their chunks to the page through a queue, ending with
+# None; an exception is passed along to be raised on the page's side
+def _stream_to_queue(chunks, *args):
+    try:
+        for chunk in stream_recipe(*args):
+            chunks.put(chunk)
     except Exception as e:
-        st.error(f"An error occurred while generating the recipe: {str(e)}")
-        return "Unable to generate recipe. Please try again."
-
-def generate_multiple_recipes(items, diet_preference, cuisine_preference, num_recipes):
+        chunks.put(e)
+    chunks.put(None)
+
+def _read_queue(chunks):
+    while (chunk := chunks.get()) is not None:
+        if isinstance(chunk, Exception):
+            raise chunk
+        yield chunk
+
+# Minimum cosine similarity for two ingredient lists to share cached recipes
+SEMANTIC_CACHE_THRESHOLD = 0.92
+
+@st.cache_resource
+def get_embedder():
+    return SentenceTransformer("all-MiniLM-L6-v2")
+
+def find_similar_recipes(embedding, preferences):
+    # Only requests with the same diet, cuisine and count are candidates;
+    # the ingredient lists are then compared by embedding similarity.
+    candidates = [(cached, recipes) for cached, prefs, recipes in st.session_state.recipe_cache if prefs == preferences]
+    if not candidates:
+        return None
+    similarities = np.stack([cached for cached, _ in candidates]) @ embedding
+    best = int(np.argmax(similarities))
+    if similarities[best] > SEMANTIC_CACHE_THRESHOLD:
+        return candidates[best][1]
+    return None
+
+# Each recipe streams into its own placeholder in `slots`
+def generate_multiple_recipes(items, diet_preference, cuisine_preference, slots):
+    num_recipes = len(slots)
+    preferences = (diet_preference, cuisine_preference, num_recipes)
+
+    embedding = None
+    if SentenceTransformer is not None:
+        embedding = get_embedder().encode(", ".join(items), normalize_embeddings=True)
+        recipes = find_similar_recipes(embedding, preferences)
+        if recipes is not None:
+            return recipes
+
+    # Each recipe is an independent request, so generate them concurrently;
+    # the streams are shown in order while the later ones keep generating
+    queues = [queue.Queue() for _ in range(num_recipes)]
     recipes = []
-    for _ in range(num_recipes):
-        recipe = generate_recipe(items, diet_preference, cuisine_preference)
-        recipes.append(recipe)
+    failed = False
+    executor = ThreadPoolExecutor(max_workers=num_recipes)
+    try:
+        for variant, chunks in enumerate(queues):
+            executor.submit(_stream_to_queue, chunks, items, diet_preference, cuisine_preference, variant)
+
+        for slot, chunks in zip(slots, queues):
+            try:
+                recipes.append(slot.write_stream(_read_queue(chunks)))
+            except Exception as e:
+                st.error(f"An error occurred while generating the recipe: {str(e)}")
+                recipes.append("Unable to generate recipe. Please try again.")
+                failed = True
+    except BaseException:
+        # Streamlit stops the script with a BaseException when the user interacts
+        # mid-stream; don't hold up the rerun until every stream finishes. The
+        # workers carry on in the background and still fill the recipe cache.
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    if embedding is not None and not failed:
+        st.session_state.recipe_cache.append((embedding, preferences, recipes))
     return recipes
 
+# Building the PDF embeds a subset of the Unicode font, which is slow enough to
+# notice on every rerun, so the link is built once per set of recipes
+@st.cache_data(max_entries=32, show_spinner=False)
 def get_pdf_download_link(recipes):
     pdf = FPDF()
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
 
-    # Use a default font
-    pdf.set_font("Arial", size=12)
+    # Use a Unicode font so characters like ° survive in the PDF
+    pdf.add_font("DejaVu", "", str(Path(__file__).with_name("fonts") / "DejaVuSans.ttf"))
+    pdf.set_font("DejaVu", size=12)
 
-    for i, recipe in enumerate(recipes, 1):
-        pdf.cell(200, 10, txt=f"Recipe {i}", ln=True, align="C")
-        pdf.multi_cell(0, 10, txt=recipe)
-        pdf.ln(10)
+    # Lay out all recipes in one multi_cell call rather than one per recipe
+    body = "\n\n".join(f"Recipe {i}\n{'=' * 40}\n{recipe}" for i, recipe in enumerate(recipes, 1))
+    pdf.multi_cell(0, 10, text=body)
 
-    pdf_output = pdf.output(dest="S").encode("latin-1", errors="ignore")
-    b64 = base64.b64encode(pdf_output).decode()
+    b64 = base64.b64encode(pdf.output()).decode('ascii')
     href = f'<a href="data:application/pdf;base64,{b64}" download="recipes.pdf">Download PDF File</a>'
     return href
 
+# The shelf and identified ingredients are saved per user, as JSON, in a local
+# SQLite file, so a browser refresh doesn't lose them (and cost another vision call).
+# Set KITCHEN_DB_PATH to keep the file outside the app directory.
+# One connection is shared by all sessions; the lock serializes its use.
+@st.cache_resource
+def get_store():
+    db_path = Path(os.getenv("KITCHEN_DB_PATH", Path(__file__).with_name("kitchen.db")))
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    store = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+    store.execute("CREATE TABLE IF NOT EXISTS user_data (user_id TEXT, name TEXT, value BLOB, PRIMARY KEY (user_id, name))")
+    store.execute("CREATE TABLE IF NOT EXISTS recipes (key TEXT PRIMARY KEY, recipe TEXT, created REAL)")
+    return store, threading.Lock()
+
+def load_user_data(name, default):
+    store, lock = get_store()
+    with lock:
+        row = store.execute("SELECT value FROM user_data WHERE user_id = ? AND name = ?",
+                            (st.session_state.user_id, name)).fetchone()
+    return orjson.loads(row[0]) if row else default
+
+def save_user_data(name, value):
+    store, lock = get_store()
+    with lock:
+        store.execute("INSERT OR REPLACE INTO user_data VALUES (?, ?, ?)",
+                      (st.session_state.user_id, name, orjson.dumps(value)))
+
+def load_cached_recipe(key):
+    store, lock = get_store()
+    with lock:
+        row = store.execute("SELECT recipe FROM recipes WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+# Only the newest recipes are kept, like the max_entries of a st.cache_data cache
+RECIPE_CACHE_MAX_ENTRIES = 1000
+
+def save_cached_recipe(key, recipe):
+    store, lock = get_store()
+    with lock:
+        store.execute("INSERT OR REPLACE INTO recipes VALUES (?, ?, ?)", (key, recipe, time.time()))
+        store.execute("DELETE FROM recipes WHERE key NOT IN (SELECT key FROM recipes ORDER BY created DESC LIMIT ?)",
+                      (RECIPE_CACHE_MAX_ENTRIES,))
+
 # Initialize session state
 def init_session_state():
-    if 'page' not in st.session_state:
-        st.session_state.page = 'Home'
+    if 'user_id' not in st.session_state:
+        # Kept in the URL so a refreshed tab finds the same saved data
+        st.session_state.user_id = st.query_params.get("user") or uuid.uuid4().hex
+    if st.query_params.get("user") != st.session_state.user_id:
+        st.query_params["user"] = st.session_state.user_id
     if 'images' not in st.session_state:
         st.session_state.images = []
+    if 'image_hashes' not in st.session_state:
+        st.session_state.image_hashes = set()
+    if 'phashes' not in st.session_state:
+        st.session_state.phashes = []
+    if 'uploaded_file_ids' not in st.session_state:
+        st.session_state.uploaded_file_ids = set()
     if 'ingredients' not in st.session_state:
-        st.session_state.ingredients = []
+        st.session_state.ingredients = load_user_data("ingredients", [])
     if 'recipes' not in st.session_state:
         st.session_state.recipes = []
+    if 'recipe_cache' not in st.session_state:
+        st.session_state.recipe_cache = []
+    if 'shelf_version' not in st.session_state:
+        # Bumped on every shelf mutation so the shelf page can reuse its DataFrame
+        st.session_state.shelf_version = 0
     if 'shelf' not in st.session_state:
         # Initialize shelf with permanent pantry items
-        st.session_state.shelf = [
-            {"Ingredient": "Salt", "Quantity": 0},
-            {"Ingredient": "Pepper", "Quantity": 0},
-            {"Ingredient": "Olive Oil", "Quantity": 0},
-            {"Ingredient": "Garlic", "Quantity": 0}
-        ]
+        # (keyed by ingredient name for direct lookup, update and removal)
+        st.session_state.shelf = load_user_data("shelf", {
+            "Salt": {"Ingredient": "Salt", "Quantity": 0},
+            "Pepper": {"Ingredient": "Pepper", "Quantity": 0},
+            "Olive Oil": {"Ingredient": "Olive Oil", "Quantity": 0},
+            "Garlic": {"Ingredient": "Garlic", "Quantity": 0}
+        })
+        # Saved expiry dates come back as ISO strings
+        for item in st.session_state.shelf.values():
+            if isinstance(item.get("Expiry"), str):
+                item["Expiry"] = datetime.date.fromisoformat(item["Expiry"])
 
 
 # Tooltip helper
@@ -223,368 +363,37 @@ def tooltip(text, help_text):
     return f'<div class="tooltip">{text}<span class="tooltiptext">{help_text}</span></div>'
 
 
+# Recipe data lives in JSON files next to this script. The file's mtime is part
+# of the cache key, so edits are picked up without restarting the app.
+@st.cache_resource(max_entries=8)
+def _read_json(filename, mtime):
+    return orjson.loads(Path(__file__).with_name(filename).read_bytes())
+
+def load_recipe_catalog():
+    return _read_json("recipes.json", Path(__file__).with_name("recipes.json").stat().st_mtime)
+
+def load_weekly_recipes():
+    return _read_json("weekly_recipes.json", Path(__file__).with_name("weekly_recipes.json").stat().st_mtime)
+
 # Full recipe list with instructions
-recipes = {
-    "Spicy Tomato Rice with Crispy Bread Crumbs": {
-        "Yields": "4 Servings",
-        "Prep Time": "15 minutes",
-        "Cook Time": "25 minutes",
-        "Ingredients": [
-            "1 cup Rice (Basmati or long grain)",
-            "2 tablespoons Atta",
-            "1 medium Onion, finely chopped",
-            "2 medium Tomatoes, diced",
-            "1 teaspoon Green Chilli Powder",
-            "Salt, to taste",
-            "1 teaspoon Sugar",
-            "2 tablespoons + 1 tablespoon Olive Oil",
-            "2 slices Bread, processed into breadcrumbs",
-            "A pinch of Pepper (optional)"
-        ],
-        "Instructions": [
-            "Rinse the rice under cold water until the water runs clear.",
-            "In a pot, combine rice with 2 cups of water and a pinch of salt. Bring to a boil, reduce heat to low, cover, and simmer for 15-20 minutes until rice is cooked.",
-            "Heat 2 tablespoons of olive oil in a pan, add onions, and cook until soft and translucent.",
-            "Stir in green chili powder and cook for 1 minute until fragrant.",
-            "Add tomatoes, salt, and sugar. Cook for 5-7 minutes until tomatoes soften and release their juices.",
-            "Whisk atta with 2-3 tablespoons of water to form a smooth slurry.",
-            "Pour the slurry into the tomato mixture and cook for 2-3 minutes until the sauce thickens slightly.",
-            "In a separate pan, heat the remaining olive oil and toast the breadcrumbs until golden and crispy. Season with salt and pepper.",
-            "Fluff the rice and pour the tomato sauce over it. Top with crispy breadcrumbs."
-        ]
-    },
-    "Coconut Curry Rice with Toasted Almonds": {
-        "Yields": "4 Servings",
-        "Prep Time": "10 minutes",
-        "Cook Time": "30 minutes",
-        "Ingredients": [
-            "1 cup Rice (Basmati or Jasmine)",
-            "1 cup Coconut Milk",
-            "1 cup Water",
-            "1 tablespoon Ginger, minced",
-            "2 cloves Garlic, minced",
-            "1 teaspoon Curry Powder",
-            "Salt, to taste",
-            "2 tablespoons Olive Oil",
-            "1/4 cup Almonds, sliced and toasted",
-            "Fresh Cilantro, for garnish"
-        ],
-        "Instructions": [
-            "In a pot, combine rice, coconut milk, water, and a pinch of salt. Bring to a boil, then reduce heat, cover, and simmer for 15-20 minutes until the rice is cooked.",
-            "Heat olive oil in a pan over medium heat. Add minced ginger and garlic, sauté for 1-2 minutes until fragrant.",
-            "Stir in curry powder and cook for another minute.",
-            "Fluff the cooked rice and mix it into the ginger-garlic mixture. Season with salt if needed.",
-            "Top with toasted almonds and garnish with cilantro."
-        ]
-    },
-    "Lemon Herb Quinoa with Roasted Vegetables": {
-        "Yields": "4 Servings",
-        "Prep Time": "15 minutes",
-        "Cook Time": "30 minutes",
-        "Ingredients": [
-            "1 cup Quinoa, rinsed",
-            "2 cups Water",
-            "1 Zucchini, diced",
-            "1 Red Bell Pepper, diced",
-            "1 cup Cherry Tomatoes, halved",
-            "2 tablespoons Lemon Juice",
-            "3 tablespoons Olive Oil",
-            "1/4 cup Fresh Parsley, chopped",
-            "Salt and Pepper, to taste"
-        ],
-        "Instructions": [
-            "In a pot, bring quinoa and water to a boil. Reduce heat, cover, and simmer for 15 minutes until quinoa is tender.",
-            "Preheat oven to 400°F (200°C). Toss zucchini, bell pepper, and cherry tomatoes with 2 tablespoons olive oil. Spread on a baking sheet and roast for 20 minutes until tender.",
-            "Fluff quinoa with a fork and toss with roasted vegetables, lemon juice, remaining olive oil, parsley, salt, and pepper."
-        ]
-    },
-    "Garlicky Spinach and Mushroom Risotto": {
-        "Yields": "4 Servings",
-        "Prep Time": "10 minutes",
-        "Cook Time": "40 minutes",
-        "Ingredients": [
-            "1 cup Arborio Rice",
-            "4 cups Vegetable Broth",
-            "2 tablespoons Olive Oil",
-            "1 small Onion, diced",
-            "3 cloves Garlic, minced",
-            "1 cup Mushrooms, sliced",
-            "2 cups Fresh Spinach",
-            "1/4 cup Parmesan Cheese, grated",
-            "Salt and Pepper, to taste"
-        ],
-        "Instructions": [
-            "In a pot, warm the vegetable broth over low heat.",
-            "In a large pan, heat olive oil over medium heat. Add onions and cook until softened.",
-            "Add garlic and mushrooms, cook for another 5-7 minutes until mushrooms are browned.",
-            "Stir in the Arborio rice and cook for 1-2 minutes to toast the rice.",
-            "Add 1 cup of broth to the rice, stirring constantly until absorbed. Continue adding broth 1/2 cup at a time until the rice is creamy and fully cooked (about 18-20 minutes).",
-            "Stir in spinach and Parmesan cheese. Season with salt and pepper."
-        ]
-    },
-    "Creamy Broccoli and Cheddar Rice Bake": {
-        "Yields": "4 Servings",
-        "Prep Time": "10 minutes",
-        "Cook Time": "40 minutes",
-        "Ingredients": [
-            "1 cup Rice (Basmati or long grain)",
-            "2 cups Broccoli florets",
-            "1 cup Cheddar cheese, grated",
-            "1 cup Milk",
-            "2 tablespoons Butter",
-            "2 tablespoons All-purpose flour",
-            "1/2 teaspoon Garlic powder",
-            "Salt and Pepper, to taste",
-            "1/4 cup Bread crumbs for topping"
-        ],
-        "Instructions": [
-            "Preheat the oven to 375°F (190°C).",
-            "Cook the rice according to package instructions and set aside.",
-            "Steam the broccoli florets until tender, about 5-7 minutes.",
-            "In a saucepan, melt the butter over medium heat. Stir in the flour and cook for 1-2 minutes until lightly browned.",
-            "Slowly whisk in the milk and cook until the sauce thickens, about 3-5 minutes.",
-            "Remove from heat and stir in the grated Cheddar cheese, garlic powder, salt, and pepper.",
-            "Combine the cooked rice, steamed broccoli, and cheese sauce. Transfer to a greased baking dish.",
-            "Sprinkle the top with bread crumbs and bake for 15-20 minutes, until the topping is golden and crispy."
-        ]
-    },
-    "Turmeric Rice with Grilled Tofu": {
-    "Yields": "4 Servings",
-    "Prep Time": "15 minutes",
-    "Cook Time": "30 minutes",
-    "Ingredients": [
-        "1 cup Basmati Rice",
-        "2 cups Water",
-        "1 teaspoon Turmeric powder",
-        "1/2 teaspoon Cumin seeds",
-        "2 tablespoons Olive Oil",
-        "1 block Tofu, pressed and cubed",
-        "1 tablespoon Soy Sauce",
-        "1 teaspoon Paprika",
-        "1 tablespoon Lemon Juice",
-        "Salt and Pepper, to taste",
-        "Fresh Cilantro, for garnish"
-    ],
-    "Instructions": [
-        "Rinse the basmati rice until the water runs clear. In a pot, bring 2 cups of water to a boil.",
-        "Add the turmeric powder and a pinch of salt to the water, then stir in the rice. Reduce heat to low, cover, and simmer for 15-20 minutes until the rice is fully cooked.",
-        "While the rice is cooking, prepare the tofu by tossing it in soy sauce, paprika, lemon juice, salt, and pepper.",
-        "Heat olive oil in a pan over medium heat and add cumin seeds. Once they start to sizzle, add the tofu cubes and cook for 7-10 minutes, turning occasionally, until crispy and golden brown on all sides.",
-        "Fluff the cooked rice and mix in the grilled tofu cubes. Garnish with fresh cilantro and serve."
-    ]
-}
-}
-# Adding new recipes to the existing recipe dictionary
-recipes.update({
-    "Coconut Rice with Mango Salsa": {
-        "Yields": "4 Servings",
-        "Prep Time": "10 minutes",
-        "Cook Time": "20 minutes",
-        "Ingredients": [
-            "1 cup Rice (Jasmine or Basmati)",
-            "1 can (13.5 oz) Coconut Milk",
-            "1 cup Water",
-            "1 teaspoon Salt",
-            "1 ripe Mango, diced",
-            "1/4 Red Onion, finely chopped",
-            "1/4 cup Fresh Cilantro, chopped",
-            "1 tablespoon Lime Juice",
-            "Salt and Pepper, to taste"
-        ],
-        "Instructions": [
-            "In a pot, combine rice, coconut milk, water, and salt. Bring to a boil, then reduce heat to low, cover, and simmer for 15-20 minutes until rice is cooked and liquid is absorbed.",
-            "While the rice is cooking, prepare the mango salsa. In a bowl, combine diced mango, red onion, cilantro, lime juice, and season with salt and pepper to taste.",
-            "Once the rice is done, fluff it with a fork and serve topped with mango salsa."
-        ]
-    },
-    "Peanut Butter Fried Rice": {
-        "Yields": "4 Servings",
-        "Prep Time": "10 minutes",
-        "Cook Time": "15 minutes",
-        "Ingredients": [
-            "2 cups Cooked Rice (preferably day-old)",
-            "2 tablespoons Peanut Butter",
-            "2 tablespoons Soy Sauce",
-            "1 tablespoon Sesame Oil",
-            "1 cup Mixed Vegetables (carrots, peas, bell peppers)",
-            "2 cloves Garlic, minced",
-            "1/2 teaspoon Ginger, minced",
-            "2 Green Onions, sliced",
-            "Salt and Pepper, to taste"
-        ],
-        "Instructions": [
-            "In a small bowl, mix peanut butter, soy sauce, and sesame oil until well combined. Set aside.",
-            "In a large pan or wok, heat a little oil over medium-high heat. Add garlic and ginger, and sauté for 1-2 minutes until fragrant.",
-            "Add the mixed vegetables and stir-fry for about 3-4 minutes until tender.",
-            "Add the cooked rice and pour the peanut butter mixture over it. Stir well to combine and cook for an additional 3-4 minutes until heated through.",
-            "Garnish with sliced green onions and serve."
-        ]
-    },
-    "Spiced Cauliflower Rice with Chickpeas": {
-        "Yields": "4 Servings",
-        "Prep Time": "15 minutes",
-        "Cook Time": "20 minutes",
-        "Ingredients": [
-            "1 head Cauliflower, grated or processed into rice-sized pieces",
-            "1 can (15 oz) Chickpeas, drained and rinsed",
-            "1 tablespoon Olive Oil",
-            "1 teaspoon Cumin",
-            "1 teaspoon Coriander",
-            "1/2 teaspoon Turmeric",
-            "Salt and Pepper, to taste",
-            "1/4 cup Fresh Parsley, chopped",
-            "Juice of 1 Lemon"
-        ],
-        "Instructions": [
-            "In a large skillet, heat olive oil over medium heat. Add grated cauliflower and cook for 5-7 minutes until tender.",
-            "Stir in the chickpeas, cumin, coriander, turmeric, salt, and pepper. Cook for another 5-7 minutes until heated through.",
-            "Remove from heat and stir in fresh parsley and lemon juice before serving."
-        ]
-    },
-    "Saffron Rice with Roasted Chicken": {
-        "Yields": "4 Servings",
-        "Prep Time": "15 minutes",
-        "Cook Time": "45 minutes",
-        "Ingredients": [
-            "1 1/2 cups Basmati Rice",
-            "3 cups Chicken Broth",
-            "1/4 teaspoon Saffron Threads",
-            "1 tablespoon Olive Oil",
-            "2 cloves Garlic, minced",
-            "1 teaspoon Cumin",
-            "Salt and Pepper, to taste",
-            "4 Chicken Thighs (bone-in, skin-on)",
-            "Fresh Cilantro, for garnish"
-        ],
-        "Instructions": [
-            "Preheat the oven to 425°F (220°C). In a small bowl, soak saffron threads in a few tablespoons of warm water for about 10 minutes.",
-            "In an oven-safe pot, heat olive oil over medium heat. Add garlic and cumin, and sauté for 1-2 minutes.",
-            "Add rice, chicken broth, saffron (with soaking water), salt, and pepper. Bring to a boil, then reduce heat, cover, and simmer for 15 minutes.",
-            "While the rice is cooking, season chicken thighs with salt and pepper. Place them skin-side up on a baking sheet and roast for 25-30 minutes until cooked through.",
-            "Serve saffron rice topped with roasted chicken and garnish with fresh cilantro."
-        ]
-    },
-    "Mexican Rice with Black Beans": {
-        "Yields": "4 Servings",
-        "Prep Time": "10 minutes",
-        "Cook Time": "20 minutes",
-        "Ingredients": [
-            "1 cup Rice (long grain or Basmati)",
-            "1 can (15 oz) Black Beans, drained and rinsed",
-            "1 cup Chicken or Vegetable Broth",
-            "1 cup Diced Tomatoes (canned or fresh)",
-            "1 teaspoon Cumin",
-            "1 teaspoon Chili Powder",
-            "Salt and Pepper, to taste",
-            "1 tablespoon Olive Oil",
-            "1/4 cup Fresh Cilantro, chopped",
-            "Lime wedges for serving"
-        ],
-        "Instructions": [
-            "In a pot, heat olive oil over medium heat. Add rice and toast for 2-3 minutes until lightly golden.",
-            "Stir in the broth, diced tomatoes, cumin, chili powder, salt, and pepper. Bring to a boil, then reduce heat, cover, and simmer for 15 minutes until rice is cooked.",
-            "Stir in black beans and cook for an additional 2-3 minutes until heated through.",
-            "Garnish with fresh cilantro and serve with lime wedges."
-        ]
-    },
-    "Mediterranean Rice with Feta and Olives": {
-        "Yields": "4 Servings",
-        "Prep Time": "10 minutes",
-        "Cook Time": "20 minutes",
-        "Ingredients": [
-            "1 cup Rice (Basmati or Jasmine)",
-            "2 cups Vegetable or Chicken Broth",
-            "1/2 cup Feta Cheese, crumbled",
-            "1/4 cup Kalamata Olives, pitted and sliced",
-            "1/4 cup Cherry Tomatoes, halved",
-            "1/4 cup Cucumber, diced",
-            "1 tablespoon Olive Oil",
-            "1 teaspoon Oregano",
-            "Salt and Pepper, to taste"
-        ],
-        "Instructions": [
-            "In a pot, combine rice and broth. Bring to a boil, then reduce heat, cover, and simmer for 15 minutes until rice is cooked.",
-            "In a large bowl, combine cooked rice with feta, olives, cherry tomatoes, cucumber, olive oil, oregano, salt, and pepper. Mix well.",
-            "Serve warm or at room temperature."
-        ]
-    },
-    "Ginger Garlic Fried Rice": {
-        "Yields": "4 Servings",
-        "Prep Time": "10 minutes",
-        "Cook Time": "10 minutes",
-        "Ingredients": [
-            "2 cups Cooked Rice (preferably day-old)",
-            "2 tablespoons Oil (vegetable or sesame)",
-            "3 cloves Garlic, minced",
-            "1 tablespoon Ginger, minced",
-            "1 cup Mixed Vegetables (peas, carrots, bell peppers)",
-            "2 tablespoons Soy Sauce",
-            "2 Green Onions, sliced",
-            "Salt and Pepper, to taste"
-        ],
-        "Instructions": [
-            "Heat oil in a large skillet over medium-high heat. Add minced garlic and ginger, and sauté for 1-2 minutes until fragrant.",
-            "Add mixed vegetables and stir-fry for about 3-4 minutes until tender.",
-            "Add the cooked rice and soy sauce. Stir well to combine and cook for an additional 3-4 minutes until heated through.",
-            "Garnish with sliced green onions and serve."
-        ]
-    },
-    "Pumpkin Risotto": {
-        "Yields": "4 Servings",
-        "Prep Time": "10 minutes",
-        "Cook Time": "30 minutes",
-        "Ingredients": [
-            "1 cup Arborio Rice",
-            "4 cups Vegetable Broth (heated)",
-            "1 cup Pumpkin Puree (canned or fresh)",
-            "1/2 cup Onion, finely chopped",
-            "2 cloves Garlic, minced",
-            "1/2 cup Parmesan Cheese, grated",
-            "2 tablespoons Olive Oil",
-            "Salt and Pepper, to taste",
-            "Fresh Sage or Parsley, for garnish"
-        ],
-        "Instructions": [
-            "In a large skillet, heat olive oil over medium heat. Add onion and garlic, and sauté until soft and translucent.",
-            "Add Arborio rice and stir for 1-2 minutes until the rice is lightly toasted.",
-            "Gradually add warm vegetable broth, one ladle at a time, stirring constantly until absorbed before adding more.",
-            "After about 15 minutes, stir in pumpkin puree. Continue adding broth and stirring until the rice is creamy and al dente, about 20-25 minutes.",
-            "Remove from heat, stir in Parmesan cheese, and season with salt and pepper.",
-            "Garnish with fresh sage or parsley before serving."
-        ]
-    }
-})
+RECIPES = load_recipe_catalog()
 
 
 # Days of the week
 days_of_week = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
 
 # Weekly recipe schedule
-weekly_recipes = [
-    ["Spicy Tomato Rice with Crispy Bread Crumbs", "Coconut Curry Rice with Toasted Almonds"],
-    ["Lemon Herb Quinoa with Roasted Vegetables", "Garlicky Spinach and Mushroom Risotto"],
-    ["Creamy Broccoli and Cheddar Rice Bake", "Turmeric Rice with Grilled Tofu"],
-    ["Coconut Rice with Mango Salsa", "Peanut Butter Fried Rice"],
-    ["Spiced Cauliflower Rice with Chickpeas", "Saffron Rice with Roasted Chicken"],
-    ["Mexican Rice with Black Beans", "Mediterranean Rice with Feta and Olives"],
-    ["Ginger Garlic Fried Rice", "Pumpkin Risotto"]
-]
-
-# Get the current day of the week from the system
-current_day = datetime.datetime.now().strftime("%A")
-
-# Find the index of the current day
-if current_day in days_of_week:
-    day_index = days_of_week.index(current_day)
-else:
-    raise ValueError(f"Invalid day of the week: {current_day}")
+weekly_recipes = load_weekly_recipes()
+
+# Get the current day of the week from the system (weekday() is locale-independent)
+day_index = datetime.date.today().weekday()
+current_day = days_of_week[day_index]
 
 # Get recipes for today
 recipes_for_today = weekly_recipes[day_index]
 
 # Function to display full recipe instructions
-def display_recipe(recipe_name):
-    recipe = recipes[recipe_name]
+def display_recipe(recipe_name, recipe):
     st.markdown(f"## {recipe_name}")
     st.markdown(f"Yields: **{recipe['Yields']}**")
     st.markdown(f"Prep Time: **{recipe['Prep Time']}**")
@@ -614,14 +423,14 @@ def home_page():
     Click 'Lets Gooo' to begin!
     """)
     if st.button('Lets Gooo', key='start_button', use_container_width=True):
-        st.session_state.page = 'Upload Images'
-        st.rerun()
+        st.switch_page(PAGES['Upload Images'])
 
     # Display the recipes for the current day
     st.header(f"Today's Recipes ({current_day}):")
-    for recipe_name in recipes_for_today:
-        if recipe_name in recipes:
-            display_recipe(recipe_name)
+    todays = [(recipe_name, RECIPES.get(recipe_name)) for recipe_name in recipes_for_today]
+    for recipe_name, recipe in todays:
+        if recipe is not None:
+            display_recipe(recipe_name, recipe)
         else:
             st.error(f"Recipe '{recipe_name}' is missing!")
 
@@ -639,119 +448,191 @@ def upload_images_page():
 
     if image_option == "Take Pictures":
         camera_image = st.camera_input("📷 Take a picture of your fridge contents")
-        if camera_image:
-            new_image = Image.open(camera_image)
-            if not is_duplicate(new_image, st.session_state.images):
-                st.session_state.images.append(new_image)
-                st.success("Image added successfully! 🎉")
-            else:
+        # Widgets keep their file across reruns; only check each file once
+        if camera_image and camera_image.file_id not in st.session_state.uploaded_file_ids:
+            st.session_state.uploaded_file_ids.add(camera_image.file_id)
+            new_image = camera_image.getvalue()
+            new_hash = image_hash(new_image)
+            if is_duplicate(new_hash):
                 st.warning("This image is a duplicate and was not added.")
+            else:
+                new_phash = perceptual_hash(Image.open(io.BytesIO(new_image)))
+                if is_near_duplicate(new_phash):
+                    st.warning("This image looks almost the same as one you already added, so it was not added. Try a different angle or another shelf.")
+                else:
+                    st.session_state.images.append((new_hash, new_image))
+                    st.session_state.image_hashes.add(new_hash)
+                    st.session_state.phashes.append(new_phash)
+                    st.success("Image added successfully! 🎉")
     else:
         uploaded_files = st.file_uploader("📤 Upload your pantry images", type=["jpg", "jpeg", "png"], accept_multiple_files=True)
         if uploaded_files:
             new_images = 0
             duplicates = 0
+            near_duplicates = 0
             for uploaded_file in uploaded_files:
-                new_image = Image.open(uploaded_file)
-                if not is_duplicate(new_image, st.session_state.images):
-                    st.session_state.images.append(new_image)
-                    new_images += 1
-                else:
+                if uploaded_file.file_id in st.session_state.uploaded_file_ids:
+                    continue
+                st.session_state.uploaded_file_ids.add(uploaded_file.file_id)
+                new_image = uploaded_file.getvalue()
+                new_hash = image_hash(new_image)
+                if is_duplicate(new_hash):
                     duplicates += 1
+                    continue
+                new_phash = perceptual_hash(Image.open(io.BytesIO(new_image)))
+                if is_near_duplicate(new_phash):
+                    near_duplicates += 1
+                    continue
+                st.session_state.images.append((new_hash, new_image))
+                st.session_state.image_hashes.add(new_hash)
+                st.session_state.phashes.append(new_phash)
+                new_images += 1
 
             if new_images > 0:
                 st.success(f"{new_images} new image(s) added successfully! 🎉")
             if duplicates > 0:
                 st.info(f"{duplicates} duplicate image(s) were not added.")
+            if near_duplicates > 0:
+                st.info(f"{near_duplicates} image(s) looked almost the same as ones already added and were not added.")
 
     if st.session_state.images:
         st.subheader("Captured/Uploaded Images")
         cols = st.columns(3)
-        for i, img in enumerate(st.session_state.images):
+        for i, (_, img) in enumerate(st.session_state.images):
             cols[i % 3].image(img, caption=f'Image {i+1}', use_column_width=True)
 
         if st.button('🗑 Clear All Images', use_container_width=True):
             st.session_state.images = []
+            st.session_state.image_hashes = set()
+            st.session_state.phashes = []
             st.rerun()
 
     # Navigation buttons
     col1, col2 = st.columns(2)
     with col1:
         if st.button('⬅ Back to Home', key='back_to_home', use_container_width=True):
-            st.session_state.page = 'Home'
-            st.rerun()
+            st.switch_page(PAGES['Home'])
     with col2:
         if st.button('Next ➡', key='to_identify', use_container_width=True):
             if not st.session_state.images:
                 st.error("Please upload at least one image before proceeding.")
             else:
-                st.session_state.page = 'Identify Ingredients'
-                st.rerun()
+                st.switch_page(PAGES['Identify Ingredients'])
 
 def identify_ingredients_page():
     st.header("🔍 Identify Ingredients")
     st.markdown("Follow these steps to identify ingredients from your fridge images.")
 
-    if not st.session_state.images:
+    if not st.session_state.images and not st.session_state.ingredients:
         st.warning("Please upload images of your fridge contents first.")
         return
 
-    if st.button('🔍 Identify Ingredients'):
-        with st.spinner('Analyzing fridge contents...'):
-            identified_items = identify_items(st.session_state.images)
-            st.session_state.ingredients = identified_items
+    # Images aren't saved across refreshes, but the ingredients identified
+    # from them are, so only the identify step needs images
+    if st.session_state.images:
+        # Skip the identify step once the current images have been identified
+        image_keys = tuple(key for key, _ in st.session_state.images)
+        if st.session_state.get('identified_images') != image_keys:
+            if st.button('🔍 Identify Ingredients'):
+                with st.spinner('Analyzing fridge contents...'):
+                    identified_items, complete = identify_items(st.session_state.images)
+                    st.session_state.ingredients = identified_items
+                    save_user_data("ingredients", identified_items)
+                    # Keep the button if any batch failed so those images can be retried
+                    if complete:
+                        st.session_state.identified_images = image_keys
 
     if st.session_state.ingredients:
         st.subheader("Identified Ingredients")
-        ingredients = st.text_area("✏ Edit, add, or remove ingredients:",
-                                   value='\n'.join(st.session_state.ingredients),
-                                   height=200)
-        st.session_state.ingredients = [item.strip() for item in ingredients.split('\n') if item.strip()]
+        # Forms only rerun the script on submit, not on every edit
+        with st.form("edit_ingredients"):
+            ingredients = st.text_area("✏ Edit, add, or remove ingredients:",
+                                       value='\n'.join(st.session_state.ingredients),
+                                       height=200)
+            save_list = st.form_submit_button("Save list")
+
+        if save_list:
+            st.session_state.ingredients = [item.strip() for item in ingredients.split('\n') if item.strip()]
+            save_user_data("ingredients", st.session_state.ingredients)
 
         st.subheader("Add ingredeants to shelf")
-        ingredient_to_add = st.selectbox("Select an ingredient to add to the shelf", st.session_state.ingredients)
+        with st.form("add_to_shelf"):
+            ingredient_to_add = st.selectbox("Select an ingredient to add to the shelf", st.session_state.ingredients)
+
+            default_expiry = datetime.date.today() + datetime.timedelta(days=7)
 
-        default_expiry = datetime.date.today() + datetime.timedelta(days=7)
-# Inside the identify_ingredients_page function
+            # Add quantity input
+            quantity = st.number_input("Quantity", min_value=1, step=1)
 
-# Add quantity input
-        quantity = st.number_input("Quantity", min_value=1, step=1)
+            # Add expiry date input
+            expiry_date = st.date_input("Expiry Date", value=default_expiry)
 
-# Add expiry date input
-        expiry_date = st.date_input("Expiry Date")
+            # Add to shelf button
+            submitted = st.form_submit_button("Add to shelf")
 
-# Add to shelf button
-        if st.button("Add to shelf"):
+        if submitted:
             if 'shelf' not in st.session_state:
-                st.session_state.shelf = []
+                st.session_state.shelf = {}
 
-    # Check if the item is already in the shelf and update the quantity/expiry
-            existing_item = next((item for item in st.session_state.shelf if item['Ingredient'] == ingredient_to_add), None)
-            if existing_item:
-                existing_item['Quantity'] += quantity
-                existing_item['Expiry'] = expiry_date  # Update expiry date if changed
+            if not ingredient_to_add:
+                st.error("Select an ingredient to add to the shelf.")
             else:
-                st.session_state.shelf.append({
-                "Ingredient": ingredient_to_add,
-                "Quantity": quantity,
-                "Expiry": expiry_date
-        })
+                # Check if the item is already in the shelf and update the quantity/expiry
+                existing_item = st.session_state.shelf.get(ingredient_to_add)
+                if existing_item:
+                    existing_item['Quantity'] += quantity
+                    existing_item['Expiry'] = expiry_date  # Update expiry date if changed
+                else:
+                    st.session_state.shelf[ingredient_to_add] = {
+                        "Ingredient": ingredient_to_add,
+                        "Quantity": quantity,
+                        "Expiry": expiry_date
+                    }
+                shelf_changed()
+                st.success(f"Added {ingredient_to_add} (Quantity: {quantity}, Expiry: {expiry_date}) to the shelf.")
 
-    st.success(f"Added {ingredient_to_add} (Quantity: {quantity}, Expiry: {expiry_date}) to the shelf.")
     col1, col2 = st.columns(2)
     with col1:
         if st.button('⬅️ Back to Upload'):
-            st.session_state.page = 'Upload Images'
-            st.rerun()
+            st.switch_page(PAGES['Upload Images'])
     with col2:
         if st.button('Next to shelf ➡️'):
-            st.session_state.page = 'shelf'
-            st.rerun()
+            st.switch_page(PAGES['shelf'])
 
+@functools.lru_cache(maxsize=1024)
 def search_amazon_url(query):
     search_url = "https://www.amazon.com/s?k=" + urllib.parse.quote(query)
     return search_url
 
+def shelf_changed():
+    st.session_state.shelf_version += 1
+    save_user_data("shelf", st.session_state.shelf)
+
+
+# Build the shelf DataFrame once per shelf version and keep it in session state,
+# so reruns that don't touch the shelf (most button clicks) reuse it
+def get_shelf_df(default_expiry):
+    cached = st.session_state.get('shelf_df_cache')
+    if cached and cached[0] == st.session_state.shelf_version:
+        return cached[1], cached[2]
+
+    shelf_df = pd.DataFrame.from_records(list(st.session_state.shelf.values()), columns=["Ingredient", "Quantity", "Expiry"])
+
+    # Ensure each item has an 'Expiry' field, if missing, set a default expiry
+    missing_expiry = shelf_df['Expiry'].isna()
+    if missing_expiry.any():
+        shelf_df['Expiry'] = shelf_df['Expiry'].astype(object).where(~missing_expiry, default_expiry)
+        for ingredient in shelf_df.loc[missing_expiry, 'Ingredient']:
+            st.session_state.shelf[ingredient]['Expiry'] = default_expiry
+        # Save the defaults so later sessions don't push them back another week
+        save_user_data("shelf", st.session_state.shelf)
+
+    expiry = pd.to_datetime(shelf_df['Expiry'])
+    shelf_df['Buy'] = shelf_df['Ingredient'].map(search_amazon_url)
+    st.session_state.shelf_df_cache = (st.session_state.shelf_version, shelf_df, expiry)
+    return shelf_df, expiry
+
+
 def shelf_page():
     st.header("🗄️ Shelf")
     st.markdown("Here you can view and manage the items in your shelf.")
@@ -759,72 +640,61 @@ def shelf_page():
     # Notification thresholds
     LOW_QUANTITY_THRESHOLD = 2  # You can adjust this value
     TODAY = datetime.date.today()
+    soon = TODAY + datetime.timedelta(days=2)
+    default_expiry = TODAY + datetime.timedelta(days=7)  # Set default expiry as 7 days from today
 
     if 'shelf' not in st.session_state or not st.session_state.shelf:
         st.warning("Your shelf is empty. Add items from the Identify items page.")
         return
 
-    # Ensure each item has an 'Expiry' field, if missing, set a default expiry
-    for item in st.session_state.shelf:
-        if 'Expiry' not in item:
-            item['Expiry'] = TODAY + datetime.timedelta(days=7)  # Set default expiry as 7 days from today
-    
-        # Show notifications for expired or low quantity items with Amazon link
-    for item in st.session_state.shelf:
-        search_url = search_amazon_url(item['Ingredient'])
+    shelf_df, expiry = get_shelf_df(default_expiry)
 
-        # Check for low quantity
-        if item['Quantity'] < LOW_QUANTITY_THRESHOLD:
-            st.warning(f"⚠️ Low quantity for **{item['Ingredient']}**: Only {item['Quantity']} left! [Buy on Amazon]({search_url})")
+    # Find expired, expiring and low quantity items with vectorized comparisons
+    low_items = shelf_df[shelf_df['Quantity'] < LOW_QUANTITY_THRESHOLD]
+    today_ts, soon_ts = pd.Timestamp(TODAY), pd.Timestamp(soon)
+    expired_items = shelf_df[expiry < today_ts]
+    expiring_items = shelf_df[(expiry >= today_ts) & (expiry <= soon_ts)]
 
-        # Check if the item is expired or close to expiry
-        if item['Expiry'] < TODAY:
-            st.error(f"❌ **{item['Ingredient']}** has expired (Expired on {item['Expiry']}). [Buy on Amazon]({search_url})")
-        elif item['Expiry'] <= TODAY + datetime.timedelta(days=2):
-            st.warning(f"⚠️ **{item['Ingredient']}** is expiring soon (Expiry: {item['Expiry']}). [Buy on Amazon]({search_url})")
+    # Show notifications for expired or low quantity items with Amazon link
+    for item in low_items.itertuples():
+        st.warning(f"⚠️ Low quantity for **{item.Ingredient}**: Only {item.Quantity} left! [Buy on Amazon]({search_amazon_url(item.Ingredient)})")
+    for item in expired_items.itertuples():
+        st.error(f"❌ **{item.Ingredient}** has expired (Expired on {item.Expiry}). [Buy on Amazon]({search_amazon_url(item.Ingredient)})")
+    for item in expiring_items.itertuples():
+        st.warning(f"⚠️ **{item.Ingredient}** is expiring soon (Expiry: {item.Expiry}). [Buy on Amazon]({search_amazon_url(item.Ingredient)})")
 
     # Create a multi-select box for selecting items for the recipe
-    shelf_items = [item['Ingredient'] for item in st.session_state.shelf]
+    shelf_items = list(st.session_state.shelf)
     selected_items = st.multiselect("Select items for the recipe:", shelf_items)
 
     # Display the shelf contents
-    if 'shelf' in st.session_state and st.session_state.shelf:
-        shelf_df = pd.DataFrame(st.session_state.shelf)
-        shelf_df['Quantity'] = shelf_df['Quantity'].astype(str)  # Convert Quantity to string for display
-        shelf_df['Expiry'] = shelf_df['Expiry'].astype(str)      # Convert Expiry to string for display
-        st.dataframe(shelf_df)
-
-    # Display shelf contents with Amazon search links
-    for item in st.session_state.shelf:
-        col1, col2 = st.columns([3, 1])
-        with col1:
-            st.write(f"**{item['Ingredient']}** (Quantity: {item['Quantity']}, Expiry: {item['Expiry']})")
-        with col2:
-            search_url = search_amazon_url(item['Ingredient'])
-            st.markdown(f"[Buy on Amazon]( {search_url} )", unsafe_allow_html=True)
+    # Convert Quantity and Expiry to string for display; Amazon search links go in the Buy column
+    st.dataframe(shelf_df.astype(str), column_config={
+        "Buy": st.column_config.LinkColumn("Buy on Amazon", display_text="Buy on Amazon")
+    })
 
     # Option to remove items or clear the shelf
-    ingredient_to_remove = st.selectbox("Select an ingredient to remove", shelf_df['Ingredient'].tolist())
+    ingredient_to_remove = st.selectbox("Select an ingredient to remove", shelf_items)
     if st.button("Remove Ingredient"):
-        st.session_state.shelf = [item for item in st.session_state.shelf if item['Ingredient'] != ingredient_to_remove]
+        st.session_state.shelf.pop(ingredient_to_remove, None)
+        shelf_changed()
         st.success(f"Removed {ingredient_to_remove} from the shelf.")
         st.rerun()
 
     if st.button('Clear Shelf', use_container_width=True):
-        st.session_state.shelf = []
+        st.session_state.shelf = {}
+        shelf_changed()
         st.success("Shelf cleared!")
         st.rerun()
 
     col1, col2 = st.columns(2)
     with col1:
         if st.button('⬅️ Back to items', use_container_width=True):
-            st.session_state.page = 'Identify items'
-            st.rerun()
+            st.switch_page(PAGES['Identify Ingredients'])
     with col2:
         if st.button('Next ➡️ Generate Recipe', use_container_width=True):
             st.session_state.selected_items = selected_items
-            st.session_state.page = 'Generate Recipe'
-            st.rerun()
+            st.switch_page(PAGES['Generate Recipe'])
 
 
 def generate_recipe_page():
@@ -855,19 +725,31 @@ def generate_recipe_page():
     with col3:
         num_recipes = st.slider("🔢 Number of recipes:", min_value=1, max_value=5, value=1)
 
-    if st.button('🧑‍🍳 Generate Recipes'):
-        with st.spinner(f'Generating {num_recipes} recipe(s)...'):
-            recipes = generate_multiple_recipes(selected_items, diet_preference, cuisine_preference, num_recipes)
-            st.session_state.recipes = recipes
-            # Remove selected items from the shelf after generating the recipe
-            st.session_state.shelf = [item for item in st.session_state.shelf if item['Ingredient'] not in selected_items]
+    generate = st.button('🧑‍🍳 Generate Recipes')
+    if generate or st.session_state.recipes:
+        st.subheader("Your Recipes")
+
+    if generate:
+        # Recipes stream into their slots as they are written; until the
+        # first text arrives each slot says it is on its way
+        slots = [st.empty() for _ in range(num_recipes)]
+        for i, slot in enumerate(slots, 1):
+            slot.info(f"🧑‍🍳 Writing recipe {i}...")
+        # Sorted tuple so equal ingredient selections share a cache entry
+        recipes = generate_multiple_recipes(tuple(sorted(selected_items)), diet_preference, cuisine_preference, slots)
+        st.session_state.recipes = recipes
+        # Remove selected items from the shelf after generating the recipe
+        for name in set(selected_items):
+            st.session_state.shelf.pop(name, None)
+        shelf_changed()
+    else:
+        slots = [st.empty() for _ in st.session_state.recipes]
 
     if st.session_state.recipes:
-        st.subheader("Your Recipes")
-        for i, recipe in enumerate(st.session_state.recipes, 1):
-            st.markdown(f'<div class="recipe-container"><h3>Recipe {i}</h3>{recipe}</div>', unsafe_allow_html=True)
+        for i, (slot, recipe) in enumerate(zip(slots, st.session_state.recipes), 1):
+            slot.markdown(f'<div class="recipe-container"><h3>Recipe {i}</h3>{recipe}</div>', unsafe_allow_html=True)
 
-        st.markdown(get_pdf_download_link(st.session_state.recipes), unsafe_allow_html=True)
+        st.markdown(get_pdf_download_link(tuple(st.session_state.recipes)), unsafe_allow_html=True)
 
         st.subheader("Buy the Pantry ingredeants Used in Recipe")
         for item in selected_items:
@@ -875,46 +757,22 @@ def generate_recipe_page():
             st.markdown(f"[buy {item} on Amazon]( {search_url} )", unsafe_allow_html=True)
 
     if st.button('⬅ Back to shelf'):
-        st.session_state.page = 'shelf'
-        st.rerun()
+        st.switch_page(PAGES['shelf'])
 
 
 
+# Pages are routed with st.navigation so only the selected page's code runs
+PAGES = {
+    "Home": st.Page(home_page, title="Home", default=True),
+    "Upload Images": st.Page(upload_images_page, title="Upload Images"),
+    "Identify Ingredients": st.Page(identify_ingredients_page, title="Identify Ingredients"),
+    "shelf": st.Page(shelf_page, title="Shelf"),
+    "Generate Recipe": st.Page(generate_recipe_page, title="Generate Recipe"),
+}
+
 def main():
     init_session_state()
-
-    # Create horizontal navigation using columns for the new pages
-    col1, col2, col3, col4, col5 = st.columns(5)
-
-    with col1:
-        if st.button("Home"):
-            st.session_state.page = "Home"
-    with col2:
-        if st.button("Upload Images"):
-            st.session_state.page = "Upload Images"
-    with col3:
-        if st.button("Identify Ingredients"):
-            st.session_state.page = "Identify Ingredients"
-    with col4:
-        if st.button("shelf"):
-            st.session_state.page = "shelf"
-    with col5:
-        if st.button("Generate Recipe"):
-            st.session_state.page = "Generate Recipe"
-
-    # Display the corresponding page content
-    if st.session_state.page == "Home":
-        home_page()
-    elif st.session_state.page == "Upload Images":
-        upload_images_page()
-    elif st.session_state.page == "Identify Ingredients":
-        identify_ingredients_page()
-    elif st.session_state.page == "shelf":
-        shelf_page()  # New shelf page function
-    elif st.session_state.page == "Generate Recipe":
-        generate_recipe_page()
-
-
+    st.navigation(list(PAGES.values())).run()
 
 
 if __name__ == "__main__":